@@ -2,6 +2,8 @@ from collections import defaultdict
 from itertools import product
 from pathlib import Path
 
+import numpy as np
+
 import Util
 
 ADJACENT_POSITIONS = [
@@ -11,6 +13,19 @@ ADJACENT_POSITIONS = [
     ( 0,  1), # down
 ]
 
+# Nines are never more than 9 steps away from a position, so the nines
+# reachable from it fit in a square window of this size centered on it.
+NINE_WINDOW_SIZE = 19
+NINE_WINDOW_CENTER = (NINE_WINDOW_SIZE // 2) * NINE_WINDOW_SIZE + NINE_WINDOW_SIZE // 2
+
+def get_neighbor_view(padded:np.ndarray, dx:int, dy:int) -> np.ndarray:
+    '''
+    Returns the view of an array padded by 1 on each side in which each
+    element is the neighbor at (dx, dy) of the unpadded element.
+    '''
+    height, width = padded.shape[0] - 2, padded.shape[1] - 2
+    return padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+
 class TopographicMap():
 
     def __init__(self, heights:list[list[int]], size:tuple[int,int]) -> None:
@@ -60,6 +75,85 @@ class TopographicMap():
             self.traverse_graph(trailhead, simple_graph, nines_reachable)
         return {trailhead: (len(nines_reachable[trailhead][0]), nines_reachable[trailhead][1]) for trailhead in trailheads}
 
+    def get_trailhead_scores_layered(self) -> dict[tuple[int,int],tuple[int,int]]:
+        '''
+        Returns the same scores as `get_trailhead_scores_distinct`, but goes
+        through the heights from 9 to 0 in layers instead of recursing. The
+        nines reachable from each position are stored as the bits of an int,
+        indexed by their offset within a window centered on the position, and
+        only the layer above the current one is kept.
+        '''
+        width, height = self.size
+        flat_heights:list[int] = [position_height for row in self.heights for position_height in row]
+        layers:list[list[int]] = [[] for i in range(10)] # the flat indices of each height's positions.
+        for index, position_height in enumerate(flat_heights):
+            layers[position_height].append(index)
+        distinct_nines_reachable:dict[int,int] = {index: 1 << NINE_WINDOW_CENTER for index in layers[9]}
+        indistinct_nines_reachable:dict[int,int] = {index: 1 for index in layers[9]}
+        for layer_height in range(8, -1, -1):
+            layer_distinct:dict[int,int] = {}
+            layer_indistinct:dict[int,int] = {}
+            for index in layers[layer_height]:
+                y, x = divmod(index, width)
+                distinct, indistinct = 0, 0
+                for neighbor_index, in_bounds, shift in (
+                    (index - 1, x > 0, -1),
+                    (index + 1, x < width - 1, 1),
+                    (index - width, y > 0, -NINE_WINDOW_SIZE),
+                    (index + width, y < height - 1, NINE_WINDOW_SIZE),
+                ):
+                    if in_bounds and flat_heights[neighbor_index] == layer_height + 1:
+                        neighbor_distinct = distinct_nines_reachable[neighbor_index]
+                        # the neighbor's nines are never more than 8 away from it, so they never leave the window.
+                        distinct |= neighbor_distinct << shift if shift > 0 else neighbor_distinct >> -shift
+                        indistinct += indistinct_nines_reachable[neighbor_index]
+                layer_distinct[index] = distinct
+                layer_indistinct[index] = indistinct
+            distinct_nines_reachable, indistinct_nines_reachable = layer_distinct, layer_indistinct
+        return {
+            (index % width, index // width): (distinct_nines_reachable[index].bit_count(), indistinct_nines_reachable[index])
+            for index in layers[0]
+        }
+
+    def to_array(self) -> np.ndarray:
+        return np.array(self.heights, dtype=np.int8)
+
+    def construct_graph_array(self, heights:np.ndarray|None=None) -> np.ndarray:
+        '''
+        Returns a boolean array of shape (4, height, width) in which element
+        [i, y, x] is True if the neighbor of (x, y) at `ADJACENT_POSITIONS[i]`
+        is one higher than (x, y).
+        '''
+        if heights is None: heights = self.to_array()
+        padded = np.pad(heights, 1, constant_values=-2) # nothing is one higher than -2.
+        return np.stack([get_neighbor_view(padded, dx, dy) == heights + 1 for dx, dy in ADJACENT_POSITIONS])
+
+    def get_trailhead_ratings_array(self, heights:np.ndarray|None=None) -> np.ndarray:
+        '''
+        Returns a uint16 array of shape (height, width) containing the number
+        of distinct trails from each trailhead, and 0 for all other positions.
+        A trail can never step back down, so no position has more than
+        4 * 3**8 trails, which fits in a uint16.
+
+        :heights: The result of `to_array` or `parse_height_array`, if already made.
+        '''
+        if heights is None: heights = self.to_array()
+        # Only the positions of the layer above the current one are nonzero,
+        # so the neighbors can be added without comparing heights.
+        padded_ratings = np.zeros((heights.shape[0] + 2, heights.shape[1] + 2), dtype=np.uint16)
+        ratings = get_neighbor_view(padded_ratings, 0, 0)
+        np.equal(heights, 9, out=ratings, casting="unsafe")
+        neighbor_ratings = np.empty(heights.shape, dtype=np.uint16)
+        in_layer = np.empty(heights.shape, dtype=bool)
+        (dx1, dy1), (dx2, dy2), *other_positions = ADJACENT_POSITIONS
+        for layer_height in range(8, -1, -1):
+            np.add(get_neighbor_view(padded_ratings, dx1, dy1), get_neighbor_view(padded_ratings, dx2, dy2), out=neighbor_ratings)
+            for dx, dy in other_positions:
+                neighbor_ratings += get_neighbor_view(padded_ratings, dx, dy)
+            np.equal(heights, layer_height, out=in_layer)
+            np.multiply(neighbor_ratings, in_layer, out=ratings)
+        return ratings
+
 def parse_map(file:Path) -> TopographicMap:
     with open(file, "rt") as f:
         lines = f.readlines()
@@ -67,12 +161,20 @@ def parse_map(file:Path) -> TopographicMap:
     size = (len(lines[0]) - 1, len(lines))
     return TopographicMap(map, size)
 
+def parse_height_array(file:Path) -> np.ndarray:
+    '''
+    Reads a map straight into an int8 array of shape (height, width), without
+    making a TopographicMap, for maps too large for lists of ints.
+    '''
+    with open(file, "rb") as f:
+        lines = f.read().split()
+    return (np.frombuffer(b"".join(lines), dtype=np.uint8).reshape(len(lines), -1) - ord("0")).astype(np.int8)
+
 def main() -> None:
     import time
     t1 = time.time()
     topographic_map = parse_map(Util.get_input_path(10, "Input"))
-    graph = topographic_map.construct_graph()
-    scores = topographic_map.get_trailhead_scores_distinct(graph)
+    scores = topographic_map.get_trailhead_scores_layered()
     t2 = time.time()
     print(t2 - t1)
     print("Part 1:")
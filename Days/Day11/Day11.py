@@ -1,14 +1,64 @@
 from collections import Counter
-from math import ceil, log10
+from functools import lru_cache
 from pathlib import Path
 
 import Util
 
+# the maximum number of stones whose children are remembered by `get_children`.
+CHILDREN_CACHE_SIZE = 1 << 16
+
+@lru_cache(maxsize=CHILDREN_CACHE_SIZE)
+def get_children(stone:int) -> tuple[int,...]:
+    '''
+    Returns the stones that a stone turns into when blinked at. The result is
+    cached across all Stones.
+    '''
+    if stone == 0:
+        return (1,)
+    engraving = str(stone)
+    if len(engraving) % 2 == 0:
+        middle = len(engraving) // 2
+        return (int(engraving[:middle]), int(engraving[middle:]))
+    return (2024 * stone,)
+
+def blink_stones(stones:Counter[int]) -> Counter[int]:
+    '''
+    Returns the stones that a Counter of stones turns into when blinked at.
+    '''
+    new_stones:Counter[int] = Counter()
+    for stone, count in stones.items():
+        for child in get_children(stone):
+            new_stones[child] += count
+    return new_stones
+
+# the maximum number of (stone, blinks) pairs remembered by `count_after`.
+COUNT_CACHE_SIZE = 1 << 20
+# the deepest that `count_after` recurses; deeper requests blink a Counter first.
+MAXIMUM_RECURSION_DEPTH = 200
+
+@lru_cache(maxsize=COUNT_CACHE_SIZE)
+def count_after(stone:int, blinks:int) -> int:
+    '''
+    Returns the number of stones that a stone turns into after blinking
+    `blinks` times.
+    '''
+    if blinks == 0:
+        return 1
+    if blinks > MAXIMUM_RECURSION_DEPTH:
+        stones = Counter([stone])
+        for i in range(blinks - MAXIMUM_RECURSION_DEPTH):
+            stones = blink_stones(stones)
+        return sum(count * count_after(child, MAXIMUM_RECURSION_DEPTH) for child, count in stones.items())
+    return sum(count_after(child, blinks - 1) for child in get_children(stone))
+
 
 class Stones():
 
     def __init__(self, stones:list[int]) -> None:
         self.stones:Counter[int] = Counter(stones)
+        # used by `count_after_blinks`; independent of `blink`.
+        self.totals:list[int] = [sum(self.stones.values())]
+        self.deepest_stones:Counter[int] = self.stones
 
     def __len__(self) -> int:
         return len(self.stones)
@@ -20,17 +70,7 @@ class Stones():
         return " ".join(str(stone) for stone in self.stones)
 
     def blink(self) -> Counter[int]:
-        stones:Counter[int] = Counter()
-        for stone, count in self.stones.items():
-            if stone == 0:
-                stones[1] += count
-            elif (engraving_length := ceil(log10(stone + 1))) % 2 == 0:
-                power = 10 ** (engraving_length // 2)
-                left_stone, right_stone = divmod(stone, power)
-                stones[left_stone] += count
-                stones[right_stone] += count
-            else:
-                stones[2024 * stone] += count
+        stones = blink_stones(self.stones)
         self.stones = stones
         return stones
 
@@ -39,6 +79,17 @@ class Stones():
             self.blink()
         return self.stones
 
+    def count_after_blinks(self, amount:int) -> int:
+        '''
+        Returns the number of stones there would be after blinking `amount`
+        times at the stones this was created with. The total at each depth is
+        remembered, so no depth is simulated twice.
+        '''
+        while len(self.totals) <= amount:
+            self.deepest_stones = blink_stones(self.deepest_stones)
+            self.totals.append(sum(self.deepest_stones.values()))
+        return self.totals[amount]
+
 def parse_stones(file:Path) -> Stones:
     with open(file, "rt") as f:
         text = f.read()
@@ -2,6 +2,8 @@ import enum
 from itertools import product
 from pathlib import Path
 
+import numpy as np
+
 import Util
 
 PLOTS = dict(zip(*[list("ABCDEFGHIJKLMNOPQRSTUVWXYZ")]*2)) # allows plots to be compared using `is`.
@@ -24,6 +26,41 @@ OFFSETS = [
     (Direction.up, 0, -1), # up
 ]
 
+def find_label(parents:list[int], label:int) -> int:
+    '''
+    Returns the root label of a label in a union-find, halving the path on the way.
+    '''
+    while parents[label] != label:
+        parents[label] = parents[parents[label]]
+        label = parents[label]
+    return label
+
+def get_component_labels(size:int, firsts:np.ndarray, seconds:np.ndarray) -> np.ndarray:
+    '''
+    Returns, for each of `size` elements, the lowest element connected to it
+    by the edges between `firsts` and `seconds`. This is a vectorized
+    union-find: the higher root of every edge is hooked onto the lower root,
+    then all paths are compressed, until no edge joins two different roots.
+    '''
+    parents = np.arange(size)
+    while True:
+        first_roots, second_roots = parents[firsts], parents[seconds]
+        different = first_roots != second_roots
+        if not different.any():
+            return parents
+        first_roots, second_roots = first_roots[different], second_roots[different]
+        np.minimum.at(parents, np.maximum(first_roots, second_roots), np.minimum(first_roots, second_roots))
+        while not np.array_equal(grandparents := parents[parents], parents):
+            parents = grandparents
+
+def get_neighbor_view(padded:np.ndarray, dx:int, dy:int) -> np.ndarray:
+    '''
+    Returns the view of an array padded by 1 on each side in which each
+    element is the neighbor at (dx, dy) of the unpadded element.
+    '''
+    height, width = padded.shape[0] - 2, padded.shape[1] - 2
+    return padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+
 class Garden():
 
     def __init__(self, plots:list[list[str]], size:tuple[int,int]) -> None:
@@ -100,6 +137,118 @@ class Garden():
             regions.append((len(region), perimeter, side_count))
         return regions
 
+    def calculate_regions_scanline(self) -> list[tuple[int,int,int]]:
+        '''
+        Returns the same regions as `calculate_regions` using one sweep over
+        the rows. Each run of equal plots in a row gets a label, and labels of
+        touching runs with the same plot are merged with a union-find. Sides
+        are counted as corners.
+        '''
+        width, height = self.size
+        parents:list[int] = []
+        areas:list[int] = []
+        perimeters:list[int] = []
+        corners:list[int] = []
+        first_plots:list[int] = [] # the lowest x * height + y of each label, so that regions are in the same order as `calculate_regions`.
+        previous_runs:list[tuple[int,int,int]] = []
+        for y, row in enumerate(self.plots):
+            above = self.plots[y - 1] if y > 0 else None
+            below = self.plots[y + 1] if y < height - 1 else None
+            runs:list[tuple[int,int,int]] = []
+            x = 0
+            while x < width:
+                start, plot = x, row[x]
+                perimeter, corner_count = 0, 0
+                while x < width and row[x] is plot:
+                    left = x > 0 and row[x - 1] is plot
+                    right = x < width - 1 and row[x + 1] is plot
+                    up = above is not None and above[x] is plot
+                    down = below is not None and below[x] is plot
+                    perimeter += 4 - left - right - up - down
+                    for horizontal, vertical, diagonal in (
+                        (left, up, up and left and above[x - 1] is plot),
+                        (right, up, up and right and above[x + 1] is plot),
+                        (left, down, down and left and below[x - 1] is plot),
+                        (right, down, down and right and below[x + 1] is plot),
+                    ):
+                        if not horizontal and not vertical or horizontal and vertical and not diagonal:
+                            corner_count += 1
+                    x += 1
+                label = len(parents)
+                parents.append(label)
+                areas.append(x - start)
+                perimeters.append(perimeter)
+                corners.append(corner_count)
+                first_plots.append(start * height + y)
+                runs.append((start, x, label))
+            # merge with the overlapping runs of the same plot in the previous row.
+            run_index, previous_index = 0, 0
+            while run_index < len(runs) and previous_index < len(previous_runs):
+                start, end, label = runs[run_index]
+                previous_start, previous_end, previous_label = previous_runs[previous_index]
+                if above is not None and start < previous_end and previous_start < end and row[start] is above[previous_start]:
+                    root, previous_root = find_label(parents, label), find_label(parents, previous_label)
+                    if root != previous_root:
+                        parents[max(root, previous_root)] = min(root, previous_root)
+                if end < previous_end:
+                    run_index += 1
+                else:
+                    previous_index += 1
+            previous_runs = runs
+
+        regions:dict[int,list[int]] = {} # root label to area, perimeter, side count, and first plot.
+        for label in range(len(parents)):
+            root = find_label(parents, label)
+            if root in regions:
+                region = regions[root]
+                region[0] += areas[label]
+                region[1] += perimeters[label]
+                region[2] += corners[label]
+                region[3] = min(region[3], first_plots[label])
+            else:
+                regions[root] = [areas[label], perimeters[label], corners[label], first_plots[label]]
+        return [(area, perimeter, side_count) for area, perimeter, side_count, _ in sorted(regions.values(), key=lambda region: region[3])]
+
+    def to_array(self) -> np.ndarray:
+        return np.frombuffer("".join("".join(row) for row in self.plots).encode(), dtype=np.uint8).reshape(self.size[1], self.size[0])
+
+    def calculate_regions_vectorized(self) -> list[tuple[int,int,int]]:
+        '''
+        Returns the same regions as `calculate_regions` using NumPy. Regions
+        are labeled by `get_component_labels`; perimeters come from
+        comparing each plot with its shifted neighbors, and side counts from
+        the corners found in each 2×2 block.
+        '''
+        width, height = self.size
+        plots = self.to_array().astype(np.int16)
+        indices = np.arange(width * height).reshape(height, width)
+        horizontal_edges = plots[:, :-1] == plots[:, 1:]
+        vertical_edges = plots[:-1, :] == plots[1:, :]
+        labels = get_component_labels(
+            width * height,
+            np.concatenate((indices[:, :-1][horizontal_edges], indices[:-1, :][vertical_edges])),
+            np.concatenate((indices[:, 1:][horizontal_edges], indices[1:, :][vertical_edges])),
+        ).reshape(height, width)
+
+        padded = np.pad(plots, 1, constant_values=-1) # not equal to any plot.
+        same = {(dx, dy): get_neighbor_view(padded, dx, dy) == plots for dx in range(-1, 2) for dy in range(-1, 2) if dx != 0 or dy != 0}
+        perimeters = sum((~same[dx, dy]).astype(np.int64) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)))
+        corners = sum(
+            (~same[dx, 0] & ~same[0, dy] | same[dx, 0] & same[0, dy] & ~same[dx, dy]).astype(np.int64)
+            for dx in (-1, 1) for dy in (-1, 1)
+        )
+
+        region_labels, plot_regions = np.unique(labels, return_inverse=True)
+        plot_regions = plot_regions.reshape(-1)
+        areas = np.bincount(plot_regions, minlength=len(region_labels))
+        region_perimeters = np.bincount(plot_regions, weights=perimeters.reshape(-1), minlength=len(region_labels)).astype(np.int64)
+        region_sides = np.bincount(plot_regions, weights=corners.reshape(-1), minlength=len(region_labels)).astype(np.int64)
+        # the lowest x * height + y of each region, so that regions are in the same order as `calculate_regions`.
+        first_plots = np.full(len(region_labels), width * height)
+        np.minimum.at(first_plots, plot_regions, (indices % width * height + indices // width).reshape(-1))
+        order = np.argsort(first_plots)
+        return list(zip(areas[order].tolist(), region_perimeters[order].tolist(), region_sides[order].tolist()))
+
 def parse_garden(file:Path) -> Garden:
     with open(file, "rt") as f:
         lines = f.readlines()
@@ -115,7 +264,7 @@ def parse_garden(file:Path) -> Garden:
 def main() -> None:
     garden = parse_garden(Util.get_input_path(12, "Input"))
     print("Part 1:")
-    pricing_info = garden.calculate_regions()
+    pricing_info = garden.calculate_regions_scanline()
     print(sum(map(lambda item: item[0] * item[1], pricing_info)))
     print("Part 2:")
     print(sum(map(lambda item: item[0] * item[2], pricing_info)))
@@ -1,7 +1,12 @@
+import re
 from pathlib import Path
 
+import numpy as np
+
 import Util
 
+MACHINE_PATTERN = re.compile(r"Button A: X\+(\d+), Y\+(\d+)\s+Button B: X\+(\d+), Y\+(\d+)\s+Prize: X=(\d+), Y=(\d+)")
+
 
 class Machine():
 
@@ -57,6 +62,57 @@ class Machine():
         else:
             return None
 
+class MachineBatch():
+
+    def __init__(self, machines:np.ndarray) -> None:
+        '''
+        :machines: An array of shape (machine count, 6) whose columns are ax, ay, bx, by, px, and py.
+        '''
+        self.machines = machines
+
+    def __len__(self) -> int:
+        return len(self.machines)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} len {len(self)}>"
+
+    def minimum_tokens(self, offset:int) -> tuple[np.ndarray,np.ndarray]:
+        '''
+        Returns the minimum tokens of every machine, and whether each machine
+        can be won at all, solving the same equations as
+        `Machine.minimum_tokens` for all machines at once. Machines whose
+        buttons are parallel are treated as unwinnable.
+
+        Uses int64 when neither the products nor the tokens can overflow it,
+        and Python ints (object arrays) otherwise.
+        '''
+        largest_behavior = int(np.abs(self.machines[:, :4]).max(initial=0))
+        largest_prize = int(np.abs(self.machines[:, 4:]).max(initial=0)) + abs(offset)
+        # each numerator, and so each of a and b, is at most 2 * largest_behavior * max(...), and the tokens are 3*a + b.
+        dtype = np.int64 if 8 * largest_behavior * max(largest_prize, largest_behavior) < 2**63 else object
+        machines = self.machines.astype(dtype)
+        ax, ay, bx, by, px, py = machines.T
+        px = px + offset
+        py = py + offset
+        determinant = bx*ay - by*ax
+        solvable = determinant != 0
+        divisor = np.where(solvable, determinant, 1)
+        # Cramer's rule; see `Machine.minimum_tokens`.
+        # np.divmod does not support object arrays.
+        a_numerator, b_numerator = bx*py - by*px, ax*py - ay*px
+        a, b = a_numerator // divisor, b_numerator // -divisor
+        solvable &= (a_numerator % divisor == 0) & (b_numerator % divisor == 0)
+        return np.where(solvable, 3*a + b, 0), solvable
+
+    def get_total_tokens(self, offset:int) -> int:
+        tokens, _ = self.minimum_tokens(offset)
+        return sum(tokens.tolist()) # the total can overflow int64 even when each machine does not.
+
+def parse_machine_batch(file:Path) -> MachineBatch:
+    with open(file, "rt") as f:
+        text = f.read()
+    return MachineBatch(np.array(MACHINE_PATTERN.findall(text), dtype=np.int64).reshape(-1, 6))
+
 def parses_machines(file:Path) -> list[Machine]:
     with open(file, "rt") as f:
         text = f.read()
@@ -70,8 +126,8 @@ def parses_machines(file:Path) -> list[Machine]:
     return machines
 
 def main() -> None:
-    machines = parses_machines(Util.get_input_path(13, "Input"))
+    machines = parse_machine_batch(Util.get_input_path(13, "Input"))
     print("Part 1:")
-    print(sum(minimum_tokens for machine in machines if (minimum_tokens := machine.minimum_tokens(offset=0)) is not None))
+    print(machines.get_total_tokens(offset=0))
     print("Part 2:")
-    print(sum(minimum_tokens for machine in machines if (minimum_tokens := machine.minimum_tokens(offset=10000000000000)) is not None))
+    print(machines.get_total_tokens(offset=10000000000000))
@@ -1,12 +1,20 @@
+import multiprocessing
+import shutil
 from functools import reduce
 from itertools import count
+from math import gcd
 from operator import mul
 from pathlib import Path
+from typing import Sequence
 
+import numpy as np
 from PIL import Image, ImageDraw
 
 import Util
 
+# the approximate number of array elements handled at once by `RobotArrays.get_bunchedness_series`.
+BLOCK_SIZE = 1 << 22
+
 
 class Robot():
 
@@ -28,6 +36,104 @@ class Robot():
     def copy(self) -> "Robot":
         return Robot(self.x, self.y, self.vx, self.vy)
 
+class RobotArrays():
+    '''
+    Stores robots as one array per attribute, so that their positions at any
+    time can be computed directly as `(p + v*t) mod size`.
+    '''
+
+    def __init__(self, size:tuple[int,int], x:np.ndarray, y:np.ndarray, vx:np.ndarray, vy:np.ndarray) -> None:
+        self.size = size
+        self.x = x
+        self.y = y
+        self.vx = vx
+        self.vy = vy
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.size[0]}×{self.size[1]} len {len(self)}>"
+
+    def get_positions(self, seconds:int) -> tuple[np.ndarray,np.ndarray]:
+        '''
+        Returns the x and y coordinates of every robot after `seconds` seconds.
+        '''
+        # positions repeat with the size, so reducing seconds first keeps v*t small.
+        return (self.x + self.vx * (seconds % self.size[0])) % self.size[0], (self.y + self.vy * (seconds % self.size[1])) % self.size[1]
+
+    def get_positions_at(self, times:Sequence[int]|np.ndarray) -> tuple[np.ndarray,np.ndarray]:
+        '''
+        Returns the x and y coordinates of every robot at each time, as arrays
+        of shape (time count, robot count). Times must fit in an int64.
+        '''
+        times = np.asarray(times, dtype=np.int64)[:, None]
+        return (self.x + self.vx * (times % self.size[0])) % self.size[0], (self.y + self.vy * (times % self.size[1])) % self.size[1]
+
+    def get_safety_factor(self, seconds:int) -> int:
+        xs, ys = self.get_positions(seconds)
+        return self.calculate_safety_factors(xs[None, :], ys[None, :])[0]
+
+    def get_safety_factors(self, times:Sequence[int]|np.ndarray) -> list[int]:
+        '''
+        Returns what `BathroomSecurity.get_safety_factor` would return after
+        each number of seconds.
+        '''
+        xs, ys = self.get_positions_at(times)
+        return self.calculate_safety_factors(xs, ys)
+
+    def calculate_safety_factors(self, xs:np.ndarray, ys:np.ndarray) -> list[int]:
+        '''
+        Returns the safety factor of each row of robot coordinates.
+        '''
+        # like `BathroomSecurity.get_safety_factor`, robots on the center line are in neither half.
+        center_x, center_y = self.size[0] // 2, self.size[1] // 2
+        left, right, top, bottom = xs < center_x, xs > center_x, ys < center_y, ys > center_y
+        quadrants = [
+            np.count_nonzero(horizontal & vertical, axis=1).astype(object) # object, so that the product cannot overflow.
+            for vertical in (top, bottom) for horizontal in (left, right)
+        ]
+        return [int(safety_factor) for safety_factor in reduce(mul, quadrants)]
+
+    def get_frames(self, times:Sequence[int]|np.ndarray) -> np.ndarray:
+        '''
+        Returns a boolean array of shape (time count, height, width) that is
+        True wherever there is a robot at each time.
+        '''
+        xs, ys = self.get_positions_at(times)
+        frames = np.zeros((len(xs), self.size[1], self.size[0]), dtype=bool)
+        frames[np.arange(len(xs))[:, None], ys, xs] = True
+        return frames
+
+    def get_bunchedness_series(self, vertical:bool) -> np.ndarray:
+        '''
+        Returns what `BathroomSecurity.get_bunchedness` would return at every
+        second of one period of the given axis.
+        '''
+        period = self.size[vertical]
+        positions, velocities = (self.y, self.vy) if vertical else (self.x, self.vx)
+        bunchedness = np.empty(period, dtype=np.int64)
+        block_length = max(1, BLOCK_SIZE // max(len(self), period))
+        for block_start in range(0, period, block_length):
+            times = np.arange(block_start, min(block_start + block_length, period), dtype=np.int64)
+            coordinates = (positions + velocities * times[:, None]) % period
+            # count the robots in every (time, line) cell at once.
+            cells = (np.arange(len(times))[:, None] * period + coordinates).reshape(-1)
+            occupancy = np.bincount(cells, minlength=len(times) * period).reshape(len(times), period)
+            bunchedness[block_start:block_start + len(times)] = np.count_nonzero(occupancy == 0, axis=1)
+        return bunchedness
+
+def frame_to_image(frame:np.ndarray) -> Image.Image:
+    height, width = frame.shape
+    return Image.frombytes("1", (width, height), np.packbits(frame, axis=1).tobytes())
+
+def write_frames(robots:RobotArrays, start:int, stop:int, output_path:Path) -> None:
+    '''
+    Saves the frames from `start` to `stop` as PNG files; used by the workers of `BathroomSecurity.to_files`.
+    '''
+    for second, frame in zip(range(start, stop), robots.get_frames(range(start, stop))):
+        frame_to_image(frame).save(output_path.joinpath(f"{second}.png"), "PNG")
+
 class BathroomSecurity():
 
     def __init__(self, size:tuple[int,int], robots:list[Robot]) -> None:
@@ -58,6 +164,15 @@ class BathroomSecurity():
     def print(self) -> None:
         print(self.stringify())
 
+    def to_robot_arrays(self) -> RobotArrays:
+        return RobotArrays(
+            self.size,
+            np.array([robot.x for robot in self.robots], dtype=np.int64),
+            np.array([robot.y for robot in self.robots], dtype=np.int64),
+            np.array([robot.vx for robot in self.robots], dtype=np.int64),
+            np.array([robot.vy for robot in self.robots], dtype=np.int64),
+        )
+
     def wait_1_second(self) -> None:
         for robot in self.robots:
             robot.move(self.size)
@@ -72,16 +187,44 @@ class BathroomSecurity():
         draw.point([(robot.x, robot.y) for robot in self.robots], fill=1)
         return image
 
-    def to_files(self, length:int, offset:int) -> None:
+    def to_files(self, length:int, offset:int, processes:int|None=None, chunk_size:int=64) -> None:
+        '''
+        Saves the frames from `offset` to `offset + length` as PNG files,
+        rendering and encoding them in a process pool. Unlike stepping with
+        `wait_seconds`, this does not move the robots.
+
+        :processes: How many PNG files are encoded at once. Defaults to the number of CPUs.
+        :chunk_size: How many consecutive frames are rendered by one `get_frames` call. The robots are pickled once per chunk.
+        '''
         output_path = Util.get_path(14, "Output")
-        output_path.mkdir(exist_ok=True)
-        for file in output_path.iterdir():
-            file.unlink()
-        self.wait_seconds(offset)
-        for second in range(length):
-            image = self.to_file()
-            image.save(output_path.joinpath(f"{second+offset}.png"), "PNG")
-            self.wait_1_second()
+        shutil.rmtree(output_path, ignore_errors=True)
+        output_path.mkdir()
+        robots = self.to_robot_arrays()
+        ranges = [
+            (robots, start, min(start + chunk_size, offset + length), output_path)
+            for start in range(offset, offset + length, chunk_size)
+        ]
+        with multiprocessing.Pool(processes) as pool:
+            pool.starmap(write_frames, ranges)
+
+    def to_bitmap_file(self, length:int, offset:int, path:Path|None=None, chunk_size:int=256) -> np.memmap:
+        '''
+        Saves the frames from `offset` to `offset + length` into one .npy file
+        of shape (length, height, ceil(width / 8)), with each row packed by
+        `np.packbits`. Open it with `np.load(path, mmap_mode="r")` and unpack a
+        frame with `np.unpackbits(frames[i], axis=1, count=width)`.
+
+        :path: Defaults to Output.npy in this day's folder.
+        :chunk_size: The number of frames rendered at a time.
+        '''
+        if path is None: path = Util.get_path(14, "Output.npy")
+        robots = self.to_robot_arrays()
+        frames = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(length, self.size[1], (self.size[0] + 7) // 8))
+        for start in range(0, length, chunk_size):
+            stop = min(start + chunk_size, length)
+            frames[start:stop] = np.packbits(robots.get_frames(range(offset + start, offset + stop)), axis=2)
+        frames.flush()
+        return frames
 
     def get_safety_factor(self) -> int:
         center_x, x_odd = divmod(self.size[0], 2)
@@ -149,11 +292,35 @@ def get_christmas_tree_time(security:BathroomSecurity) -> int:
     else:
         assert False
 
+def get_christmas_tree_time_vectorized(robots:RobotArrays) -> int:
+    '''
+    Finds the same time as `get_christmas_tree_time`, scoring every second of
+    each axis's period at once and combining the two anomalies with the
+    Chinese remainder theorem.
+    '''
+    offsets:list[int] = []
+    for vertical, name in ((False, "horizontal"), (True, "vertical")):
+        size = robots.size[vertical]
+        expected_bunchedness = size * (1 - 1/size)**len(robots)
+        anomalies = np.nonzero(robots.get_bunchedness_series(vertical) > 10 * expected_bunchedness)[0]
+        if len(anomalies) == 0:
+            raise RuntimeError(f"No {name} bunchedness anomalies detected!")
+        if len(anomalies) > 1:
+            raise RuntimeError(f"Multiple {name} bunchedness anomalies detected!")
+        offsets.append(int(anomalies[0]))
+    horizontal_offset, vertical_offset = offsets
+    width, height = robots.size
+    # find the lowest time = height * i + vertical_offset that is horizontal_offset mod width.
+    divisor = gcd(width, height)
+    if (horizontal_offset - vertical_offset) % divisor != 0:
+        raise RuntimeError("Bunchedness anomalies never coincide!")
+    reduced_width = width // divisor
+    i = (horizontal_offset - vertical_offset) // divisor * pow(height // divisor, -1, reduced_width) % reduced_width if reduced_width > 1 else 0
+    return height * i + vertical_offset
+
 def main() -> None:
     security = parse_security(Util.get_input_path(14, "Input"))
     print("Part 1:")
-    security_1 = security.copy()
-    security_1.wait_seconds(100)
-    print(security_1.get_safety_factor())
+    print(security.to_robot_arrays().get_safety_factor(100))
     print("Part 2:")
-    print(get_christmas_tree_time(security))
+    print(get_christmas_tree_time_vectorized(security.to_robot_arrays()))
@@ -1,6 +1,9 @@
 import enum
+from itertools import groupby
 from pathlib import Path
-from typing import Sequence
+from typing import Iterator, Sequence
+
+from typing_extensions import Self
 
 import Util
 
@@ -33,6 +36,10 @@ WIDE_TILES:dict[Tile,tuple[Tile,Tile]] = {
 DIRECTION_CHARACTERS:dict[str,Direction] = {"^": Direction.up, "v": Direction.down, "<": Direction.left, ">": Direction.right}
 DIRECTION_CHARACTERS_REVERSE:Sequence[str] = "^v<>"
 
+# the byte that represents each Tile in a CompactWarehouse.
+TILE_BYTES:dict[Tile,int] = {tile: ord(tile.value) for tile in Tile}
+BYTE_TILES:dict[int,Tile] = {byte: tile for tile, byte in TILE_BYTES.items()}
+
 class Warehouse():
 
     def __init__(self, tiles:list[list[Tile]], robot_location:tuple[int,int], instructions:list[Direction], size:tuple[int,int]) -> None:
@@ -78,6 +85,16 @@ class Warehouse():
             if tile is Tile.box
         )
 
+    def replay(self, interval:int) -> Iterator[tuple[int,int]]:
+        '''
+        Follows the instructions, yielding the number of instructions followed
+        so far and the GPS coordinates after every `interval` instructions.
+        '''
+        for step, instruction in enumerate(self.instructions, start=1):
+            self.move_robot(instruction)
+            if step % interval == 0:
+                yield step, self.get_gps_coordinates()
+
 class SkinnyWarehouse(Warehouse):
 
     def stringify(self) -> str:
@@ -111,6 +128,40 @@ class SkinnyWarehouse(Warehouse):
             # If True, the box moved.
             self.robot_location = (tile_x, tile_y)
 
+    def move_robot_repeatedly(self, direction:Direction, amount:int) -> None:
+        '''
+        Moves the robot `amount` times in one direction with a single scan.
+        The robot moves once for each empty tile ahead of it before the next
+        wall, up to `amount`, and every box it passes ends up packed in front
+        of it.
+        '''
+        x, y = self.robot_location
+        dx, dy = OFFSETS[direction.value]
+        empty_count, box_count = 0, 0
+        boxes_pushed = 0 # the boxes between the robot and the last empty tile it uses.
+        tile_x, tile_y = x, y
+        while empty_count < amount:
+            tile_x, tile_y = tile_x + dx, tile_y + dy
+            tile = self[tile_x, tile_y]
+            if tile is Tile.wall:
+                break
+            elif tile is Tile.box:
+                box_count += 1
+            else:
+                empty_count += 1
+                boxes_pushed = box_count
+        for distance in range(1, empty_count + boxes_pushed + 1):
+            self[x + distance*dx, y + distance*dy] = Tile.empty if distance <= empty_count else Tile.box
+        self.robot_location = (x + empty_count*dx, y + empty_count*dy)
+
+    def follow_instructions_batched(self) -> None:
+        '''
+        Has the same result as `follow_instructions`, but moves the robot
+        through each run of equal instructions at once.
+        '''
+        for direction, run in groupby(self.instructions):
+            self.move_robot_repeatedly(direction, sum(1 for instruction in run))
+
 class WideWarehouse(Warehouse):
 
     def stringify(self) -> str:
@@ -129,35 +180,30 @@ class WideWarehouse(Warehouse):
         if self[tile_position] is Tile.empty:
             return True
         dx, dy = offset
+        if dy == 0:
+            return self.push_horizontally(tile_position, dx)
         visited_tiles:list[tuple[int,int]] = []
-        visited_map:list[list[bool]] = [[False] * self.size[0] for y in range(self.size[1])]
+        visited_set:set[tuple[int,int]] = set() # only holds the tiles being pushed, so that this is proportional to the boxes moved.
         unexplored_tiles:list[tuple[int,int]] = [tile_position]
         # GRAPH THEORY; huzzah!
 
         while len(unexplored_tiles) > 0:
             x, y = unexplored_tiles.pop()
-            if visited_map[y][x]:
+            if (x, y) in visited_set:
                 continue
             if self[x, y] is Tile.wall:
                 return False
             # because it goes depth first it's going to find any walls in the way faster (probably)
 
-            neighbor_tiles:list[tuple[int,int]]
-            if dx == 0:
-                neighbor_tiles = [
-                    neighbor_position
-                    for offset in range(-1, 2)
-                    if self[neighbor_position := (x + offset, y + dy)] is not Tile.empty
-                ]
-            else:
-                # The only tile that can affect this tile is the one at x + 2.
-                # There cannot be a tile at x + 1.
-                neighbor_position = (x + 2*dx, y)
-                neighbor_tiles = [neighbor_position] if self[neighbor_position] is not Tile.empty else []
+            neighbor_tiles:list[tuple[int,int]] = [
+                neighbor_position
+                for offset in range(-1, 2)
+                if self[neighbor_position := (x + offset, y + dy)] is not Tile.empty
+            ]
 
             unexplored_tiles.extend(neighbor_tiles)
             visited_tiles.append((x, y))
-            visited_map[y][x] = True
+            visited_set.add((x, y))
 
         visited_tiles.reverse() # in a vertical line push, this will cause
         # tiles furthest away to be moved first. This prevents a situation in
@@ -167,6 +213,23 @@ class WideWarehouse(Warehouse):
             self[x, y], self[x2, y2] = self[x2, y2], self[x, y]
         return True
 
+    def push_horizontally(self, tile_position:tuple[int,int], dx:int) -> bool:
+        '''
+        Pushes a line of boxes left or right with a linear scan.
+        '''
+        x, y = tile_position
+        box_positions:list[int] = []
+        while self[x, y] is Tile.box:
+            box_positions.append(x)
+            # The only tile that can affect this tile is the one at x + 2.
+            # There cannot be a tile at x + 1.
+            x += 2*dx
+        if self[x, y] is Tile.wall:
+            return False
+        for box_x in reversed(box_positions):
+            self[box_x, y], self[box_x + dx, y] = self[box_x + dx, y], self[box_x, y]
+        return True
+
     def move_robot(self, direction: Direction) -> None:
         x, y = self.robot_location
         dx, dy = OFFSETS[direction.value]
@@ -179,6 +242,62 @@ class WideWarehouse(Warehouse):
             # If True, the box moved.
             self.robot_location = (x + dx, y + dy)
 
+class CompactWarehouse(Warehouse):
+    '''
+    A Warehouse whose tiles are stored as one byte each in a bytearray. It
+    keeps a running total of its GPS coordinates, updated whenever a box is
+    placed or removed, so `get_gps_coordinates` is O(1).
+    '''
+
+    @classmethod
+    def from_warehouse(cls, warehouse:Warehouse) -> Self:
+        cells = bytearray(TILE_BYTES[tile] for row in warehouse.tiles for tile in row)
+        return cls(cells, warehouse.robot_location, warehouse.instructions, warehouse.size)
+
+    def __init__(self, cells:bytearray, robot_location:tuple[int,int], instructions:list[Direction], size:tuple[int,int]) -> None:
+        self.cells = cells
+        self.robot_location = robot_location
+        self.instructions = instructions
+        self.size = size
+        box_byte = TILE_BYTES[Tile.box]
+        self.gps_coordinates = sum(
+            index % size[0] + 100 * (index // size[0])
+            for index, cell in enumerate(cells)
+            if cell == box_byte
+        )
+
+    @property
+    def tiles(self) -> list[list[Tile]]:
+        # only used for stringifying.
+        width = self.size[0]
+        return [[BYTE_TILES[cell] for cell in self.cells[y*width:(y+1)*width]] for y in range(self.size[1])]
+
+    def __getitem__(self, position:tuple[int,int]) -> Tile:
+        return BYTE_TILES[self.cells[position[1] * self.size[0] + position[0]]]
+
+    def __setitem__(self, position:tuple[int,int], tile:Tile) -> None:
+        x, y = position
+        index = y * self.size[0] + x
+        if BYTE_TILES[self.cells[index]] is Tile.box:
+            self.gps_coordinates -= x + 100 * y
+        if tile is Tile.box:
+            self.gps_coordinates += x + 100 * y
+        self.cells[index] = TILE_BYTES[tile]
+
+    def get[T](self, position:tuple[int,int], default:T=None) -> Tile|T:
+        x, y = position
+        if x >= 0 and x < self.size[0] and y >= 0 and y < self.size[1]:
+            return BYTE_TILES[self.cells[y * self.size[0] + x]]
+        else:
+            return default
+
+    def get_gps_coordinates(self) -> int:
+        return self.gps_coordinates
+
+class CompactSkinnyWarehouse(CompactWarehouse, SkinnyWarehouse): ...
+
+class CompactWideWarehouse(CompactWarehouse, WideWarehouse): ...
+
 def parse_warehouse(file:Path) -> tuple[SkinnyWarehouse, WideWarehouse]:
     with open(file, "rt") as f:
         text = f.read()
@@ -215,7 +334,7 @@ def parse_warehouse(file:Path) -> tuple[SkinnyWarehouse, WideWarehouse]:
 def main() -> None:
     skinny_warehouse, wide_warehouse = parse_warehouse(Util.get_input_path(15, "Input"))
     print("Part 1:")
-    skinny_warehouse.follow_instructions()
+    skinny_warehouse.follow_instructions_batched()
     print(skinny_warehouse.get_gps_coordinates())
     print("Part 2:")
     wide_warehouse.follow_instructions()
@@ -1,4 +1,5 @@
 import enum
+import heapq
 from itertools import product
 from pathlib import Path
 
@@ -36,6 +37,11 @@ RIGHTS = [
     Direction.south,
 ]
 
+# Predecessor flag of a state that was reached by moving forward from the
+# previous tile. Flags 1 << 0 to 1 << 3 mean that the state was reached by
+# turning on the same tile from that direction.
+MOVED_FLAG = 1 << 4
+
 class Maze():
 
     def __init__(self, grid:list[list[Tile]], size:tuple[int,int], start:tuple[int,int], end:tuple[int,int]) -> None:
@@ -145,6 +151,81 @@ class Maze():
                         best_tiles_set[neighbor_y][neighbor_x] = True
         return minimum_score, best_tiles_count
 
+    def compete_heap(self) -> tuple[int,int]:
+        '''
+        Returns the same as `compete`, using a heap over states encoded as
+        `(y * width + x) * 4 + direction`. The optimal predecessors of each
+        state are kept as flags in a bytearray and walked back to count the
+        best tiles.
+        '''
+        width, height = self.size
+        walls = bytearray(tile is Tile.wall for row in self.grid for tile in row)
+        state_count = width * height * 4
+        maximum_score = 1000 * state_count + 1
+        scores = [maximum_score] * state_count
+        predecessors = bytearray(state_count)
+        turns = [(LEFTS[direction].value, RIGHTS[direction].value) for direction in range(4)]
+        steps = [dy * width + dx for dx, dy in OFFSETS]
+
+        start_x, start_y = self.start
+        end_x, end_y = self.end
+        end_cell = end_y * width + end_x
+        start_state = (start_y * width + start_x) * 4 + Direction.east.value
+        scores[start_state] = 0
+        heap:list[tuple[int,int]] = [(0, start_state)]
+        end_score = maximum_score
+        while len(heap) > 0:
+            score, state = heapq.heappop(heap)
+            if score > end_score:
+                break # all end states that tie for the minimum are settled.
+            if score > scores[state]:
+                continue # stale heap entry.
+            cell, direction = divmod(state, 4)
+            if cell == end_cell:
+                end_score = score
+                continue
+            neighbors:list[tuple[int,int,int]] = [(cell * 4 + turn, score + 1000, 1 << direction) for turn in turns[direction]]
+            x, y = cell % width + OFFSETS[direction][0], cell // width + OFFSETS[direction][1]
+            if x >= 0 and x < width and y >= 0 and y < height and not walls[next_cell := cell + steps[direction]]:
+                neighbors.append((next_cell * 4 + direction, score + 1, MOVED_FLAG))
+            for neighbor_state, neighbor_score, flag in neighbors:
+                if neighbor_score < scores[neighbor_state]:
+                    scores[neighbor_state] = neighbor_score
+                    predecessors[neighbor_state] = flag
+                    heapq.heappush(heap, (neighbor_score, neighbor_state))
+                elif neighbor_score == scores[neighbor_state]:
+                    predecessors[neighbor_state] |= flag
+
+        minimum_direction, minimum_score = None, maximum_score
+        for direction in Direction:
+            if (score := scores[end_cell * 4 + direction.value]) < minimum_score:
+                minimum_score = score
+                minimum_direction = direction
+        assert minimum_direction is not None
+
+        end_state = end_cell * 4 + minimum_direction.value
+        unvisited_states = [end_state]
+        visited_states = bytearray(state_count)
+        visited_states[end_state] = True
+        best_tiles = bytearray(width * height)
+        best_tiles[end_cell] = True
+        best_tiles_count = 1
+        while len(unvisited_states) > 0:
+            state = unvisited_states.pop()
+            cell, direction = divmod(state, 4)
+            flags = predecessors[state]
+            neighbor_states = [cell * 4 + turn for turn in range(4) if flags & (1 << turn)]
+            if flags & MOVED_FLAG:
+                neighbor_states.append(state - steps[direction] * 4)
+            for neighbor_state in neighbor_states:
+                if not visited_states[neighbor_state]:
+                    visited_states[neighbor_state] = True
+                    unvisited_states.append(neighbor_state)
+                    if not best_tiles[neighbor_cell := neighbor_state // 4]:
+                        best_tiles[neighbor_cell] = True
+                        best_tiles_count += 1
+        return minimum_score, best_tiles_count
+
 def parse_maze(file:Path) -> Maze:
     with open(file, "rt") as f:
         lines = f.readlines()
@@ -172,7 +253,7 @@ def main() -> None:
         f.write("")
     maze = parse_maze(Util.get_input_path(16, "Input"))
     print("Part 1:")
-    minimum_score, best_tiles =maze.compete()
+    minimum_score, best_tiles = maze.compete_heap()
     print(minimum_score)
     print("Part 2:")
     print(best_tiles)
@@ -1,4 +1,6 @@
 import enum
+import multiprocessing
+from bisect import bisect_left, bisect_right, insort
 from collections import defaultdict
 from itertools import count, product, takewhile
 from pathlib import Path
@@ -42,6 +44,9 @@ RIGHT_DIRECTION:dict[Direction,Direction] = {
     Direction.left: Direction.up,
 }
 
+# used to encode a node as a small integer; see `Map.enters_loop`.
+DIRECTION_INDICES:dict[Direction,int] = {direction: index for index, direction in enumerate(Direction)}
+
 def point_in_bounds(position:tuple[int,int], size:tuple[int,int]) -> bool:
     x, y = position
     return x >= 0 and x < size[0] and y >= 0 and y < size[1]
@@ -85,6 +90,71 @@ class Guard():
         self.direction = output
         return output
 
+class ObstacleIndex():
+    '''
+    Stores the obstacles of each row and column in sorted order, so that the
+    next obstacle in any direction can be found with a binary search.
+    '''
+
+    def __init__(self, rows:list[list[int]], columns:list[list[int]]) -> None:
+        self.rows = rows # the sorted x coordinates of the obstacles in each row.
+        self.columns = columns # the sorted y coordinates of the obstacles in each column.
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {len(self.columns)}×{len(self.rows)}>"
+
+    def __contains__(self, position:tuple[int,int]) -> bool:
+        x, y = position
+        row = self.rows[y]
+        index = bisect_left(row, x)
+        return index < len(row) and row[index] == x
+
+    def next_obstacle(self, x:int, y:int, direction:Direction) -> tuple[int,int]|None:
+        '''
+        Returns the position of the nearest obstacle strictly in front of (x, y)
+        in the given direction, or None if there is no such obstacle.
+        '''
+        match direction:
+            case Direction.up:
+                column = self.columns[x]
+                index = bisect_left(column, y)
+                return (x, column[index - 1]) if index > 0 else None
+            case Direction.right:
+                row = self.rows[y]
+                index = bisect_right(row, x)
+                return (row[index], y) if index < len(row) else None
+            case Direction.down:
+                column = self.columns[x]
+                index = bisect_right(column, y)
+                return (x, column[index]) if index < len(column) else None
+            case Direction.left:
+                row = self.rows[y]
+                index = bisect_left(row, x)
+                return (row[index - 1], y) if index > 0 else None
+
+    def with_obstacle(self, position:tuple[int,int]) -> "ObstacleIndex":
+        '''
+        Returns a new ObstacleIndex with an additional obstacle. Only the row
+        and column of the new obstacle are copied.
+        '''
+        x, y = position
+        rows = self.rows.copy()
+        rows[y] = rows[y].copy()
+        insort(rows[y], x)
+        columns = self.columns.copy()
+        columns[x] = columns[x].copy()
+        insort(columns[x], y)
+        return ObstacleIndex(rows, columns)
+
+def construct_obstacle_index(obstacle_positions:list[tuple[int,int]], size:tuple[int,int]) -> ObstacleIndex:
+    rows:list[list[int]] = [[] for y in range(size[1])]
+    columns:list[list[int]] = [[] for x in range(size[0])]
+    for x, y in sorted(obstacle_positions):
+        rows[y].append(x) # sorted by x, so each row is sorted.
+    for x, y in sorted(obstacle_positions, key=lambda position: position[1]):
+        columns[x].append(y)
+    return ObstacleIndex(rows, columns)
+
 class Edge():
 
     start:tuple[int,int,Direction]
@@ -131,14 +201,18 @@ class InfiniteEdge(Edge):
             case Direction.down: yield from ((x, y + i) for i in count())
             case Direction.left: yield from ((x - i, y) for i in count())
 
-class Map():
+class MapView():
+    '''
+    The traversal shared by `Map` and `OverlayMap`. Subclasses provide
+    `guard`, `size`, `is_obstacle`, and `get_edge`.
+    '''
 
-    def __init__(self, guard:Guard, size:tuple[int,int], obstacle_positions:list[tuple[int,int]], edges:dict[tuple[int,int,Direction],Edge], relevant_edges:dict[tuple[int,int],list[Edge]]) -> None:
-        self.guard = guard
-        self.size = size
-        self.obstacle_positions:list[tuple[int,int]] = obstacle_positions
-        self.edges:dict[tuple[int,int,Direction],Edge] = edges
-        self.relevant_edges = relevant_edges
+    guard:Guard
+    size:tuple[int,int]
+
+    def is_obstacle(self, position:tuple[int,int]) -> bool: ...
+
+    def get_edge(self, node:tuple[int,int,Direction]) -> Edge: ...
 
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} {self.size[0]}×{self.size[1]}>"
@@ -147,7 +221,7 @@ class Map():
         if traversed_positions is None: traversed_positions = set()
         return "\n".join(
             "".join(
-                str(self.guard) if (x, y) == self.guard.position else TILE_STRINGS[(x, y) in self.obstacle_positions, (x, y) in traversed_positions]
+                str(self.guard) if (x, y) == self.guard.position else TILE_STRINGS[self.is_obstacle((x, y)), (x, y) in traversed_positions]
                 for x in range(self.size[0])
             ) for y in range(self.size[1])
         )
@@ -166,7 +240,7 @@ class Map():
             if node in visited_nodes:
                 return visited_tiles, True
             visited_nodes.add(node)
-            edge = self.edges[node]
+            edge = self.get_edge(node)
             if isinstance(edge, FiniteEdge):
                 if not ignore_visited_tiles:
                     visited_tiles.update(edge)
@@ -176,41 +250,162 @@ class Map():
                     visited_tiles.update(takewhile(lambda position: point_in_bounds(position, self.size), edge))
                 return visited_tiles, False
 
-    def get_loop_causing_obstacles(self, traversed_positions:set[tuple[int,int]]) -> list[tuple[int,int]]:
-        loop_causing_obstacles:list[tuple[int,int]] = []
-        for new_obstacle in traversed_positions:
-            new_map = insert_obstacle(self, new_obstacle)
+    def get_first_visits(self) -> dict[tuple[int,int],tuple[int,int,Direction]]:
+        '''
+        Returns, for each position on the guard's path, the start of the edge
+        on which the guard first reaches that position.
+        '''
+        first_visits:dict[tuple[int,int],tuple[int,int,Direction]] = {}
+        visited_nodes:set[tuple[int,int,Direction]] = set()
+        node = self.guard.node()
+        while node not in visited_nodes:
+            visited_nodes.add(node)
+            edge = self.get_edge(node)
+            for position in takewhile(lambda position: point_in_bounds(position, self.size), edge):
+                first_visits.setdefault(position, node)
+            if not isinstance(edge, FiniteEdge):
+                break
+            node = edge.end
+        return first_visits
+
+    def new_visited_states(self) -> bytearray:
+        '''
+        Returns a zeroed bytearray large enough for `enters_loop`.
+        '''
+        return bytearray(self.size[0] * self.size[1] * len(DIRECTION_INDICES))
+
+    def enters_loop(self, start_node:tuple[int,int,Direction], visited_states:bytearray) -> bool:
+        '''
+        Returns if a guard starting at `start_node` enters a loop. Nodes are
+        marked in `visited_states` (from `new_visited_states`), which is zeroed
+        again before returning so that it can be reused.
+        '''
+        width = self.size[0]
+        marked_states:list[int] = []
+        node = start_node
+        looped = False
+        while True:
+            x, y, direction = node
+            state = (y * width + x) * 4 + DIRECTION_INDICES[direction]
+            if visited_states[state]:
+                looped = True
+                break
+            visited_states[state] = 1
+            marked_states.append(state)
+            edge = self.get_edge(node)
+            if not isinstance(edge, FiniteEdge):
+                break
+            node = edge.end
+        for state in marked_states:
+            visited_states[state] = 0
+        return looped
+
+class Map(MapView):
+
+    def __init__(self, guard:Guard, size:tuple[int,int], obstacle_positions:list[tuple[int,int]], obstacle_index:ObstacleIndex, edges:dict[tuple[int,int,Direction],Edge], relevant_edges:dict[tuple[int,int],list[Edge]]) -> None:
+        self.guard = guard
+        self.size = size
+        self.obstacle_positions:list[tuple[int,int]] = obstacle_positions
+        self.obstacle_index = obstacle_index
+        self.edges:dict[tuple[int,int,Direction],Edge] = edges
+        self.relevant_edges = relevant_edges
+
+    def is_obstacle(self, position:tuple[int,int]) -> bool:
+        return position in self.obstacle_index
+
+    def get_edge(self, node:tuple[int,int,Direction]) -> Edge:
+        return self.edges[node]
+
+    def is_loop_causing_obstacle(self, new_obstacle:tuple[int,int], first_visits:dict[tuple[int,int],tuple[int,int,Direction]]|None=None, visited_states:bytearray|None=None) -> bool:
+        '''
+        Returns if placing an obstacle at `new_obstacle` makes the guard loop.
+        If `first_visits` and `visited_states` are given, the guard starts from
+        the node before her first visit to `new_obstacle`, since the path up to
+        there is unchanged by the new obstacle.
+        '''
+        new_map = overlay_obstacle(self, new_obstacle)
+        if first_visits is None or visited_states is None:
             _, looped = new_map.traverse(True)
-            if looped:
-                loop_causing_obstacles.append(new_obstacle)
-        return loop_causing_obstacles
-
-def traverse_grid(obstacle_set:set[tuple[int,int]], size:tuple[int,int], start_x:int, start_y:int, start_direction:Direction) -> Edge:
-    guard = Guard((start_x, start_y), start_direction)
-    while True:
-        if guard.in_front_of_position() in obstacle_set:
-            end_x, end_y = guard.position
-            end_direction = guard.turn_right()
-            return FiniteEdge((start_x, start_y, start_direction), (end_x, end_y, end_direction))
-        elif not point_in_bounds(guard.position, size):
-            return InfiniteEdge((start_x, start_y, start_direction))
-        else:
-            guard.advance()
+            return looped
+        return new_map.enters_loop(first_visits.get(new_obstacle, self.guard.node()), visited_states)
+
+    def get_loop_causing_obstacles(self, traversed_positions:set[tuple[int,int]], parallel:bool=False, processes:int|None=None, chunk_size:int=64, from_first_visit:bool=True) -> list[tuple[int,int]]:
+        '''
+        Returns the positions at which a new obstacle would cause the guard to loop.
+
+        :parallel: If True, tests the positions in a process pool instead of serially.
+        :processes: The number of worker processes. Defaults to the number of CPUs.
+        :chunk_size: The number of positions sent to a worker at a time.
+        :from_first_visit: If True, skips the part of the path before each position is first reached.
+        '''
+        first_visits = self.get_first_visits() if from_first_visit else None
+        if not parallel:
+            visited_states = self.new_visited_states() if from_first_visit else None
+            return [new_obstacle for new_obstacle in traversed_positions if self.is_loop_causing_obstacle(new_obstacle, first_visits, visited_states)]
+        candidates:list[tuple[int,int]] = list(traversed_positions)
+        # The Map is sent to each worker once by the initializer instead of with every chunk.
+        with multiprocessing.Pool(processes, initializer=initialize_worker, initargs=(self, first_visits)) as pool:
+            looped = pool.map(worker_is_loop_causing_obstacle, candidates, chunk_size)
+        return [new_obstacle for new_obstacle, is_looped in zip(candidates, looped) if is_looped]
+
+class OverlayMap(MapView):
+    '''
+    A view of a Map with one extra obstacle that stores only the edges changed
+    by that obstacle, and falls back to its base Map for all other edges. It
+    can be traversed, but not have further obstacles added to it.
+    '''
+
+    def __init__(self, base_map:Map, new_obstacle_position:tuple[int,int], changed_edges:dict[tuple[int,int,Direction],Edge]) -> None:
+        self.base_map = base_map
+        self.new_obstacle_position = new_obstacle_position
+        self.changed_edges = changed_edges
+        self.guard = base_map.guard
+        self.size = base_map.size
+
+    def is_obstacle(self, position:tuple[int,int]) -> bool:
+        return position == self.new_obstacle_position or self.base_map.is_obstacle(position)
+
+    def get_edge(self, node:tuple[int,int,Direction]) -> Edge:
+        edge = self.changed_edges.get(node)
+        return self.base_map.get_edge(node) if edge is None else edge
+
+# The state shared with each worker process by `initialize_worker`.
+worker_map:Map|None = None
+worker_first_visits:dict[tuple[int,int],tuple[int,int,Direction]]|None = None
+worker_visited_states:bytearray|None = None
+
+def initialize_worker(map:Map, first_visits:dict[tuple[int,int],tuple[int,int,Direction]]|None) -> None:
+    global worker_map, worker_first_visits, worker_visited_states
+    worker_map = map
+    worker_first_visits = first_visits
+    worker_visited_states = map.new_visited_states() if first_visits is not None else None
+
+def worker_is_loop_causing_obstacle(new_obstacle:tuple[int,int]) -> bool:
+    assert worker_map is not None
+    return worker_map.is_loop_causing_obstacle(new_obstacle, worker_first_visits, worker_visited_states)
+
+def traverse_grid(obstacle_index:ObstacleIndex, size:tuple[int,int], start_x:int, start_y:int, start_direction:Direction) -> Edge:
+    obstacle = obstacle_index.next_obstacle(start_x, start_y, start_direction)
+    if obstacle is None:
+        return InfiniteEdge((start_x, start_y, start_direction))
+    obstacle_x, obstacle_y = obstacle
+    dx, dy = DIRECTION_OFFSETS[start_direction]
+    return FiniteEdge((start_x, start_y, start_direction), (obstacle_x - dx, obstacle_y - dy, RIGHT_DIRECTION[start_direction]))
 
 def construct_initial_map(obstacle_positions:list[tuple[int,int]], guard:Guard, size:tuple[int,int]) -> Map:
-    obstacle_set:set[tuple[int,int]] = set(obstacle_positions)
+    obstacle_index = construct_obstacle_index(obstacle_positions, size)
     edges:dict[tuple[int,int,Direction],Edge] = {
-        (obstacle_x + dx, obstacle_y + dy, start_direction): traverse_grid(obstacle_set, size, obstacle_x + dx, obstacle_y + dy, start_direction)
+        (obstacle_x + dx, obstacle_y + dy, start_direction): traverse_grid(obstacle_index, size, obstacle_x + dx, obstacle_y + dy, start_direction)
         for (obstacle_x, obstacle_y), (dx, dy, start_direction) in product(obstacle_positions, TILE_OFFSETS)
         if point_in_bounds((obstacle_x + dx, obstacle_y + dy), size)
     }
     guard_x, guard_y = guard.position
-    edges[guard.node()] = traverse_grid(obstacle_set, size, guard_x, guard_y, guard.direction)
-    relevant_edges:dict[tuple[int,int],list[Edge]] = defaultdict(lambda: [])
+    edges[guard.node()] = traverse_grid(obstacle_index, size, guard_x, guard_y, guard.direction)
+    relevant_edges:dict[tuple[int,int],list[Edge]] = defaultdict(list) # not a lambda, so that it can be pickled.
     for edge in edges.values():
         for position in takewhile(lambda position: point_in_bounds(position, size), edge):
             relevant_edges[position].append(edge)
-    return Map(guard, size, obstacle_positions, edges, relevant_edges)
+    return Map(guard, size, obstacle_positions, obstacle_index, edges, relevant_edges)
 
 def insert_obstacle(initial_map:Map, new_obstacle_position:tuple[int,int]) -> Map:
     # relevant_edges does not need to be updated, since it's only used in creating new obstacles.
@@ -221,11 +416,27 @@ def insert_obstacle(initial_map:Map, new_obstacle_position:tuple[int,int]) -> Ma
         # An edge's start should always be its key in edges, so it should be overwritten.
         new_edges[relevant_edge.start] = relevant_edge.insert_obstacle(new_obstacle_position)
     obstacle_x, obstacle_y = new_obstacle_position
-    obstacle_set:set[tuple[int,int]] = set(new_obstacle_positions)
     for dx, dy, start_direction in TILE_OFFSETS:
         if point_in_bounds((obstacle_x + dx, obstacle_y + dy), initial_map.size):
-            new_edges[obstacle_x + dx, obstacle_y + dy, start_direction] = traverse_grid(obstacle_set, initial_map.size, obstacle_x + dx, obstacle_y + dy, start_direction)
-    return Map(initial_map.guard, initial_map.size, new_obstacle_positions, new_edges, initial_map.relevant_edges)
+            # The edges starting next to the new obstacle run perpendicular to
+            # it, so they can never hit it; the old index is enough here.
+            new_edges[obstacle_x + dx, obstacle_y + dy, start_direction] = traverse_grid(initial_map.obstacle_index, initial_map.size, obstacle_x + dx, obstacle_y + dy, start_direction)
+    new_obstacle_index = initial_map.obstacle_index.with_obstacle(new_obstacle_position)
+    return Map(initial_map.guard, initial_map.size, new_obstacle_positions, new_obstacle_index, new_edges, initial_map.relevant_edges)
+
+def overlay_obstacle(base_map:Map, new_obstacle_position:tuple[int,int]) -> OverlayMap:
+    '''
+    Like `insert_obstacle`, but without copying the edges or obstacles of `base_map`.
+    '''
+    changed_edges:dict[tuple[int,int,Direction],Edge] = {
+        relevant_edge.start: relevant_edge.insert_obstacle(new_obstacle_position)
+        for relevant_edge in base_map.relevant_edges[new_obstacle_position]
+    }
+    obstacle_x, obstacle_y = new_obstacle_position
+    for dx, dy, start_direction in TILE_OFFSETS:
+        if point_in_bounds((obstacle_x + dx, obstacle_y + dy), base_map.size):
+            changed_edges[obstacle_x + dx, obstacle_y + dy, start_direction] = traverse_grid(base_map.obstacle_index, base_map.size, obstacle_x + dx, obstacle_y + dy, start_direction)
+    return OverlayMap(base_map, new_obstacle_position, changed_edges)
 
 def parse_map(file:Path) -> Map:
     with open(file, "rt") as f:
@@ -250,4 +461,4 @@ def main() -> None:
     traversed_points, _ = map.traverse(False)
     print(len(traversed_points))
     print("Part 2:")
-    print(len(map.get_loop_causing_obstacles(traversed_points)))
+    print(len(map.get_loop_causing_obstacles(traversed_points, parallel=True)))
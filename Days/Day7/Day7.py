@@ -1,5 +1,6 @@
-from math import ceil, log10
+import multiprocessing
 from pathlib import Path
+from typing import Sequence
 
 import Util
 
@@ -9,6 +10,8 @@ class Equation():
     def __init__(self, test_value:int, numbers:list[int]) -> None:
         self.test_value = test_value
         self.numbers = numbers
+        # the smallest power of 10 greater than each number, for concatenation.
+        self.powers = [10**len(str(number)) for number in numbers]
 
     def __len__(self) -> int:
         return len(self.numbers)
@@ -26,7 +29,7 @@ class Equation():
             return False
         number = self.numbers[index]
         if allow_concat:
-            power = 10**ceil(log10(number + 1))
+            power = self.powers[index]
             if result % power == number and self.try_value(result//power, index - 1, allow_concat, goal):
                 return True
         quotient, remainder = divmod(result, number)
@@ -36,6 +39,164 @@ class Equation():
             return True
         return False
 
+class Operator():
+    '''
+    An operator that can be placed between two numbers of an Equation. The
+    result of an operator must never be less than its left operand, since
+    Solver uses that to prune.
+    '''
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}>"
+
+    def apply(self, left:int, number:int, power:int) -> int:
+        '''
+        Returns the result of combining `left` with `number`.
+
+        :power: The smallest power of 10 greater than `number`.
+        '''
+        ...
+
+    def unapply(self, result:int, number:int, power:int) -> int|None:
+        '''
+        Returns the left operand that gives `result` when combined with
+        `number`, or None if there is no such operand.
+
+        :power: The smallest power of 10 greater than `number`.
+        '''
+        ...
+
+class AddOperator(Operator):
+
+    def apply(self, left:int, number:int, power:int) -> int:
+        return left + number
+
+    def unapply(self, result:int, number:int, power:int) -> int|None:
+        return result - number
+
+class MultiplyOperator(Operator):
+
+    def apply(self, left:int, number:int, power:int) -> int:
+        return left * number
+
+    def unapply(self, result:int, number:int, power:int) -> int|None:
+        quotient, remainder = divmod(result, number)
+        return quotient if remainder == 0 else None
+
+class ConcatenateOperator(Operator):
+
+    def apply(self, left:int, number:int, power:int) -> int:
+        return left * power + number
+
+    def unapply(self, result:int, number:int, power:int) -> int|None:
+        quotient, remainder = divmod(result, power)
+        return quotient if remainder == number else None
+
+class Solver():
+
+    def __init__(self, operators:Sequence[Operator], meet_in_the_middle_budget:int|None=100000) -> None:
+        '''
+        :operators: The operators that may be used, in the order they are tried.
+        :meet_in_the_middle_budget: The number of partial results the depth-first search may try before the equation is checked with `meet_in_the_middle` instead. If None, it is never used.
+        '''
+        self.operators = tuple(operators)
+        self.meet_in_the_middle_budget = meet_in_the_middle_budget
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {", ".join(operator.__class__.__name__ for operator in self.operators)}>"
+
+    def can_be_made_true(self, equation:Equation) -> bool:
+        result = self.depth_first_search(equation, self.meet_in_the_middle_budget)
+        if result is None:
+            # Only degenerate equations, such as ones with many 1s, get here.
+            return self.meet_in_the_middle(equation)
+        return result
+
+    def depth_first_search(self, equation:Equation, budget:int|None=None) -> bool|None:
+        '''
+        Checks an equation by undoing operators from the test value back to
+        the first number. Returns None if more than `budget` partial results
+        are tried.
+        '''
+        numbers, powers = equation.numbers, equation.powers
+        goal = numbers[0]
+        reversed_operators = self.operators[::-1] # so that the first operator is popped first.
+        unexplored:list[tuple[int,int]] = [(equation.test_value, len(numbers) - 1)]
+        explored_count = 0
+        while len(unexplored) > 0:
+            result, index = unexplored.pop()
+            explored_count += 1
+            if budget is not None and explored_count > budget:
+                return None
+            if index == 0:
+                if result == goal:
+                    return True
+                continue
+            if result < goal:
+                continue
+            number, power = numbers[index], powers[index]
+            for operator in reversed_operators:
+                previous_result = operator.unapply(result, number, power)
+                if previous_result is not None:
+                    unexplored.append((previous_result, index - 1))
+        return False
+
+    def meet_in_the_middle(self, equation:Equation) -> bool:
+        '''
+        Checks an equation by finding all values reachable from the first half
+        of its numbers, and all values from which the test value is reachable
+        using the second half, then intersecting them.
+        '''
+        numbers, powers = equation.numbers, equation.powers
+        test_value, goal = equation.test_value, numbers[0]
+        middle = max(1, len(numbers) // 2)
+        forward_values:set[int] = {goal}
+        for number, power in zip(numbers[1:middle], powers[1:middle]):
+            forward_values = {
+                result
+                for left in forward_values
+                for operator in self.operators
+                if (result := operator.apply(left, number, power)) <= test_value
+            }
+        backward_values:set[int] = {test_value}
+        for number, power in zip(reversed(numbers[middle:]), reversed(powers[middle:])):
+            backward_values = {
+                previous_result
+                for result in backward_values
+                for operator in self.operators
+                if (previous_result := operator.unapply(result, number, power)) is not None and previous_result >= goal
+            }
+        return not forward_values.isdisjoint(backward_values)
+
+    def get_calibration_result(self, equations:Sequence[Equation], parallel:bool=False, processes:int|None=None, chunk_size:int=1024) -> int:
+        '''
+        Returns the sum of the test values of the equations that can be made true.
+
+        :parallel: If True, splits the equations between several processes.
+        :processes: How many equations are checked at once. Defaults to the number of CPUs.
+        :chunk_size: How many equations a process is handed at a time. Most equations take microseconds, so small chunks would spend more time pickling than checking.
+        '''
+        if not parallel:
+            return sum(equation.test_value for equation in equations if self.can_be_made_true(equation))
+        # `pool.map` only passes each equation, so the processes are given this Solver when they start.
+        with multiprocessing.Pool(processes, initializer=initialize_worker, initargs=(self,)) as pool:
+            results = pool.map(worker_can_be_made_true, equations, chunk_size)
+        return sum(equation.test_value for equation, result in zip(equations, results) if result)
+
+# the Solver used by `worker_can_be_made_true` in a process of `Solver.get_calibration_result`'s pool.
+worker_solver:Solver|None = None
+
+def initialize_worker(solver:Solver) -> None:
+    global worker_solver
+    worker_solver = solver
+
+def worker_can_be_made_true(equation:Equation) -> bool:
+    assert worker_solver is not None
+    return worker_solver.can_be_made_true(equation)
+
+PART_1_SOLVER = Solver((MultiplyOperator(), AddOperator()))
+PART_2_SOLVER = Solver((ConcatenateOperator(), MultiplyOperator(), AddOperator()))
+
 def parse_equations(file:Path) -> list[Equation]:
     with open(file, "rt") as f:
         text:list[str] = f.readlines()
@@ -50,6 +211,6 @@ def parse_equations(file:Path) -> list[Equation]:
 def main() -> None:
     equations = parse_equations(Util.get_input_path(7, "Input"))
     print("Part 1:")
-    print(sum(equation.test_value for equation in equations if equation.can_be_made_true(False)))
+    print(PART_1_SOLVER.get_calibration_result(equations, parallel=True))
     print("Part 2:")
-    print(sum(equation.test_value for equation in equations if equation.can_be_made_true(True)))
+    print(PART_2_SOLVER.get_calibration_result(equations, parallel=True))
@@ -1,16 +1,90 @@
 from collections import defaultdict
-from itertools import combinations, count
+from itertools import combinations
 from pathlib import Path
-from typing import Callable, Iterable
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
 
 import Util
 
+# the approximate number of antenna pairs handled at once by `get_antenna_pairs`.
+PAIR_BLOCK_SIZE = 1 << 20
+# the approximate number of points generated at once by `get_resonant_antinode_bitmap`.
+POINT_BLOCK_SIZE = 1 << 22
+# the number of bytes of a bitmap counted at once by `count_bitmap`.
+BITMAP_BLOCK_SIZE = 1 << 24
+
 
 def point_in_bounds(point:tuple[int,int], size:tuple[int,int]) -> bool:
     x, y = point
     sx, sy = size
     return x >= 0 and x < sx and y >= 0 and y < sy
 
+def get_antenna_pairs(positions:np.ndarray) -> Iterator[tuple[np.ndarray,np.ndarray]]:
+    '''
+    Yields the first and second positions of every pair of antennas, a block
+    at a time so that memory stays bounded.
+    '''
+    antenna_count = len(positions)
+    block_size = max(1, PAIR_BLOCK_SIZE // antenna_count)
+    indices = np.arange(antenna_count)
+    for block_start in range(0, antenna_count - 1, block_size):
+        firsts = indices[block_start:block_start + block_size]
+        first_indices, second_indices = np.nonzero(firsts[:, None] < indices[None, :])
+        yield positions[firsts[first_indices]], positions[second_indices]
+
+def get_offset_ranges(origins:np.ndarray, steps:np.ndarray, size:tuple[int,int]) -> tuple[np.ndarray,np.ndarray]:
+    '''
+    Returns the lowest and highest integer k for which `origin - k * step` is
+    in bounds, for each row of `origins` and `steps`. Every origin must be in
+    bounds and every step must be nonzero.
+    '''
+    unbounded = max(size) # no step is smaller than 1, so no range is wider than this.
+    lower = np.full(len(origins), -unbounded, dtype=np.int64)
+    upper = np.full(len(origins), unbounded, dtype=np.int64)
+    for axis in range(2):
+        origin, step, bound = origins[:, axis], steps[:, axis], size[axis]
+        nonzero = step != 0
+        divisor = np.where(nonzero, np.abs(step), 1)
+        # the distances to the edges that the point moves towards as k increases and decreases.
+        increasing_distance = np.where(step > 0, origin, bound - 1 - origin)
+        decreasing_distance = np.where(step > 0, bound - 1 - origin, origin)
+        upper = np.where(nonzero, np.minimum(upper, increasing_distance // divisor), upper)
+        lower = np.where(nonzero, np.maximum(lower, -(decreasing_distance // divisor)), lower)
+    return lower, upper
+
+def get_line_points(origins:np.ndarray, steps:np.ndarray, lower:np.ndarray, upper:np.ndarray) -> tuple[np.ndarray,np.ndarray]:
+    '''
+    Returns the x and y coordinates of `origin - k * step` for every k from
+    `lower` to `upper` inclusive, for each row of `origins` and `steps`.
+    '''
+    counts = np.maximum(upper - lower + 1, 0)
+    line_indices = np.repeat(np.arange(len(origins)), counts)
+    # k counts up from each line's lower bound.
+    offsets = lower[line_indices] + np.arange(len(line_indices)) - np.repeat(np.cumsum(counts) - counts, counts)
+    points = origins[line_indices] - offsets[:, None] * steps[line_indices]
+    return points[:, 0], points[:, 1]
+
+def get_line_blocks(counts:np.ndarray) -> Iterator[slice]:
+    '''
+    Yields slices of consecutive lines with about `POINT_BLOCK_SIZE` points in
+    total, where `counts` is the number of points on each line.
+    '''
+    cumulative_counts = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        points_before = cumulative_counts[start - 1] if start > 0 else 0
+        end = max(start + 1, int(np.searchsorted(cumulative_counts, points_before + POINT_BLOCK_SIZE, "right")))
+        yield slice(start, end)
+        start = end
+
+def count_bitmap(bitmap:bytearray) -> int:
+    '''
+    Returns the number of set bits in a bitmap.
+    '''
+    view = memoryview(bitmap)
+    return sum(int.from_bytes(view[start:start + BITMAP_BLOCK_SIZE]).bit_count() for start in range(0, len(view), BITMAP_BLOCK_SIZE))
+
 class Map():
 
     def __init__(self, antennas:dict[str,list[tuple[int,int]]], size:tuple[int,int]) -> None:
@@ -38,6 +112,53 @@ class Map():
                     antinodes.add(antinode)
         return antinodes
 
+    def get_antinode_mask(self, resonant:bool) -> np.ndarray:
+        '''
+        Returns a boolean array of shape (height, width) that is True at each
+        antinode. If `resonant`, this matches `get_antinodes(lambda: count(0))`;
+        otherwise, it matches `get_antinodes(lambda: [1])`.
+        '''
+        mask = np.zeros((self.size[1], self.size[0]), dtype=bool)
+        for frequency, antennas in self.antennas.items():
+            if len(antennas) < 2: continue
+            for firsts, seconds in get_antenna_pairs(np.array(antennas, dtype=np.int64)):
+                # antinodes are at first - k * step and at second + k * step (= second - k * -step).
+                steps = seconds - firsts
+                origins = np.concatenate((firsts, seconds))
+                steps = np.concatenate((steps, -steps))
+                lower, upper = get_offset_ranges(origins, steps, self.size)
+                if resonant:
+                    lower = np.maximum(lower, 0)
+                else:
+                    lower = np.maximum(lower, 1)
+                    upper = np.minimum(upper, 1)
+                xs, ys = get_line_points(origins, steps, lower, upper)
+                mask[ys, xs] = True
+        return mask
+
+    def get_resonant_antinode_bitmap(self) -> bytearray:
+        '''
+        Returns the antinodes at every grid position exactly in line with two
+        antennas of the same frequency, as a bitmap in which the position
+        (x, y) is bit `(y * width + x) % 8` of byte `(y * width + x) // 8`.
+        Unlike `get_antinodes`, each line's step is reduced by the gcd of its
+        components, so no lattice point between antennas is skipped.
+        '''
+        width, height = self.size
+        bitmap = bytearray((width * height + 7) // 8)
+        bitmap_view = np.frombuffer(bitmap, dtype=np.uint8)
+        for frequency, antennas in self.antennas.items():
+            if len(antennas) < 2: continue
+            for firsts, seconds in get_antenna_pairs(np.array(antennas, dtype=np.int64)):
+                steps = seconds - firsts
+                steps //= np.gcd(steps[:, 0], steps[:, 1])[:, None]
+                lower, upper = get_offset_ranges(firsts, steps, self.size)
+                for lines in get_line_blocks(upper - lower + 1):
+                    xs, ys = get_line_points(firsts[lines], steps[lines], lower[lines], upper[lines])
+                    cells = ys * width + xs
+                    np.bitwise_or.at(bitmap_view, cells >> 3, np.left_shift(1, cells & 7).astype(np.uint8))
+        return bitmap
+
 def parse_map(file:Path) -> Map:
     with open(file, "rt") as f:
         lines = f.readlines()
@@ -53,6 +174,6 @@ def parse_map(file:Path) -> Map:
 def main() -> None:
     map = parse_map(Util.get_input_path(8, "Input"))
     print("Part 1:")
-    print(len(map.get_antinodes(lambda: [1])))
+    print(map.get_antinode_mask(False).sum())
     print("Part 2:")
-    print(len(map.get_antinodes(lambda: count(0))))
+    print(count_bitmap(map.get_resonant_antinode_bitmap()))
@@ -1,10 +1,75 @@
+from array import array
+from heapq import heapify, heappop, heappush
 from itertools import starmap, takewhile
 from pathlib import Path
-from typing import Callable, Iterator
+from typing import Callable, Iterable, Iterator
 
 import Util
 
 
+def get_series_sum(start:int, length:int) -> int:
+    '''
+    Returns the sum of start, start + 1, ..., start + length - 1.
+    '''
+    return length * start + length * (length - 1) // 2
+
+class FreeSpaceAllocator():
+    '''
+    Finds the leftmost gap of at least some length, using one min-heap of gap
+    starts for each gap length shorter than the longest file, and one min-heap
+    of (start, length) for all longer gaps, any of which can fit any file.
+    '''
+
+    def __init__(self, gaps:Iterable[tuple[int,int]], maximum_length:int) -> None:
+        '''
+        :gaps: The start and length of each gap.
+        :maximum_length: The length of the longest file that will be allocated.
+        '''
+        self.maximum_length = maximum_length
+        self.heaps:list[list[int]] = [[] for i in range(maximum_length)] # indexed by gap length.
+        self.long_heap:list[tuple[int,int]] = []
+        for start, length in gaps:
+            self.add_gap(start, length)
+        for heap in self.heaps:
+            heapify(heap)
+        heapify(self.long_heap)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {sum(len(heap) for heap in self.heaps[1:]) + len(self.long_heap)} gaps>"
+
+    def add_gap(self, start:int, length:int) -> None:
+        if length >= self.maximum_length:
+            self.long_heap.append((start, length))
+        else:
+            self.heaps[length].append(start)
+
+    def allocate(self, length:int, before:int) -> int|None:
+        '''
+        Returns the start of the leftmost gap of at least `length` blocks that
+        starts before `before`, and removes `length` blocks from the start of
+        that gap. Returns None if there is no such gap.
+        '''
+        best_start = before
+        best_length:int|None = None
+        for gap_length in range(length, self.maximum_length):
+            heap = self.heaps[gap_length]
+            if len(heap) > 0 and heap[0] < best_start:
+                best_start = heap[0]
+                best_length = gap_length
+        if len(self.long_heap) > 0 and self.long_heap[0][0] < best_start:
+            best_start, best_length = heappop(self.long_heap)
+        elif best_length is None:
+            return None
+        else:
+            heappop(self.heaps[best_length])
+        if best_length > length:
+            remaining_length = best_length - length
+            if remaining_length >= self.maximum_length:
+                heappush(self.long_heap, (best_start + length, remaining_length))
+            else:
+                heappush(self.heaps[remaining_length], best_start + length)
+        return best_start
+
 class DiskMap():
 
     def __init__(self, space:list[int|None]|None=None) -> None:
@@ -40,6 +105,21 @@ class DiskMap():
             if all(item is None for item in window):
                 yield block - required_length
 
+    def get_free_spaces(self) -> Iterator[tuple[int,int]]:
+        '''
+        Returns the start and length of each gap.
+        '''
+        start:int|None = None
+        for block, id_number in enumerate(self.space):
+            if id_number is None:
+                if start is None:
+                    start = block
+            elif start is not None:
+                yield start, block - start
+                start = None
+        if start is not None:
+            yield start, len(self) - start
+
     def get_files(self) -> Iterator[tuple[int,int,int]]:
         '''
         Returns the id number, length, and starting position of all files in reversed order.
@@ -62,15 +142,12 @@ class DiskMap():
             yield current_id, length, 0
 
     def move_blocks_defragmented(self) -> None:
-        self.free_spaces = [self.get_free_space(length) for length in range(1, 10)]
-        for id_number, length, start_block in self.get_files():
-            try:
-                free_block = next(self.free_spaces[length-1])
-            except StopIteration:
-                # cannot move file if no space is available.
-                continue
-            if free_block > start_block:
-                # cannot move file if no space is to the left.
+        files = list(self.get_files())
+        allocator = FreeSpaceAllocator(self.get_free_spaces(), max((length for id_number, length, start_block in files), default=0))
+        for id_number, length, start_block in files:
+            free_block = allocator.allocate(length, start_block)
+            if free_block is None:
+                # cannot move file if no space is available to the left.
                 continue
             for new_block, old_block in zip(range(free_block, free_block+length), range(start_block, start_block+length), strict=True):
                 self.space[new_block], self.space[old_block] = self.space[old_block], self.space[new_block]
@@ -79,6 +156,140 @@ class DiskMap():
         func:Callable[[tuple[int,int|None]],bool] = lambda item: item[1] is not None # for some reason doesn't allow this to be in-line.
         return sum(starmap(lambda block, id_number: block * id_number, filter(func, enumerate(self.space))))
 
+class RunLengthDiskMap():
+    '''
+    A DiskMap that stores each file as a run of (start, length, id number)
+    in parallel arrays instead of one element per block. Free space is not
+    stored; it is whatever lies between the runs. The runs are not
+    necessarily in order of their starts.
+    '''
+
+    def __init__(self, starts:array[int]|None=None, lengths:array[int]|None=None, id_numbers:array[int]|None=None, size:int=0) -> None:
+        self.starts:array[int] = array("q") if starts is None else starts
+        self.lengths:array[int] = array("q") if lengths is None else lengths
+        self.id_numbers:array[int] = array("q") if id_numbers is None else id_numbers
+        self.size = size
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} len {len(self)}, {len(self.starts)} runs>"
+
+    def __len__(self) -> int:
+        return self.size
+
+    def copy(self) -> "RunLengthDiskMap":
+        return RunLengthDiskMap(array("q", self.starts), array("q", self.lengths), array("q", self.id_numbers), self.size)
+
+    def stringify(self) -> str:
+        space = ["."] * self.size
+        for start, length, id_number in self.get_runs():
+            space[start:start+length] = [str(id_number % 10)] * length
+        return "".join(space)
+
+    def allocate(self, id_number:int|None, amount:int) -> None:
+        if id_number is not None and amount > 0:
+            self.starts.append(self.size)
+            self.lengths.append(amount)
+            self.id_numbers.append(id_number)
+        self.size += amount
+
+    def get_runs(self) -> Iterator[tuple[int,int,int]]:
+        '''
+        Returns the start, length, and id number of each run.
+        '''
+        return zip(self.starts, self.lengths, self.id_numbers)
+
+    def set_runs(self, runs:list[tuple[int,int,int]]) -> None:
+        self.starts = array("q", (start for start, length, id_number in runs))
+        self.lengths = array("q", (length for start, length, id_number in runs))
+        self.id_numbers = array("q", (id_number for start, length, id_number in runs))
+
+    def get_sorted_runs(self) -> list[tuple[int,int,int]]:
+        '''
+        Returns the runs in order of their starts, after an empty run at
+        position 0 so that the gap before the first run is also between runs.
+        '''
+        return [(0, 0, 0)] + sorted(self.get_runs())
+
+    def move_blocks(self) -> None:
+        runs = self.get_sorted_runs()
+        new_runs:list[tuple[int,int,int]] = []
+        # the leftmost runs stay in place while the gap after each is filled
+        # from the end of the rightmost run.
+        left = 0
+        right = len(runs) - 1
+        right_length = runs[right][1] if right >= 0 else 0
+        while left < right:
+            start, length, id_number = runs[left]
+            if length > 0:
+                new_runs.append(runs[left])
+            gap_start, gap_end = start + length, runs[left + 1][0]
+            while gap_start < gap_end and left < right:
+                amount = min(gap_end - gap_start, right_length)
+                new_runs.append((gap_start, amount, runs[right][2]))
+                gap_start += amount
+                right_length -= amount
+                if right_length == 0:
+                    right -= 1
+                    right_length = runs[right][1]
+            left += 1
+        if left == right and right_length > 0:
+            # whatever is left of the last run stays at its start.
+            new_runs.append((runs[right][0], right_length, runs[right][2]))
+        self.set_runs(new_runs)
+
+    def get_free_spaces(self) -> Iterator[tuple[int,int]]:
+        '''
+        Returns the start and length of each gap before or between runs.
+        '''
+        runs = self.get_sorted_runs()
+        for (start, length, _), (next_start, _, _) in zip(runs, runs[1:]):
+            if next_start > start + length:
+                yield start + length, next_start - start - length
+
+    def move_blocks_defragmented(self) -> None:
+        allocator = FreeSpaceAllocator(self.get_free_spaces(), max(self.lengths, default=0))
+        # Files only move left, so the space they leave is never to the left
+        # of a file that has not moved yet, and is not given to the allocator.
+        new_runs:list[tuple[int,int,int]] = []
+        for start, length, id_number in sorted(self.get_runs(), reverse=True):
+            free_block = allocator.allocate(length, start)
+            new_runs.append((start if free_block is None else free_block, length, id_number))
+        self.set_runs(new_runs)
+
+    def get_checksum(self) -> int:
+        return sum(id_number * get_series_sum(start, length) for start, length, id_number in self.get_runs())
+
+def get_compacted_checksum(dense_map:str) -> int:
+    '''
+    Returns the checksum that `DiskMap.move_blocks` would produce, directly
+    from the dense disk map, without building any blocks.
+    '''
+    checksum = 0
+    position = 0
+    left = 0
+    # the last file, which is the first to be moved into gaps.
+    right = len(dense_map) - 1 if len(dense_map) % 2 == 1 else len(dense_map) - 2
+    right_remaining = ord(dense_map[right]) - 48 if right >= 0 else 0
+    while left <= right:
+        if left % 2 == 0:
+            length = right_remaining if left == right else ord(dense_map[left]) - 48
+            checksum += left // 2 * get_series_sum(position, length)
+            position += length
+        else:
+            gap = ord(dense_map[left]) - 48
+            while gap > 0 and right > left:
+                amount = min(gap, right_remaining)
+                checksum += right // 2 * get_series_sum(position, amount)
+                position += amount
+                gap -= amount
+                right_remaining -= amount
+                if right_remaining == 0:
+                    right -= 2
+                    if right > left:
+                        right_remaining = ord(dense_map[right]) - 48
+        left += 1
+    return checksum
+
 def parse_disk_map(file:Path) -> DiskMap:
     with open(file, "rt") as f:
         text = f.read()
@@ -89,12 +300,28 @@ def parse_disk_map(file:Path) -> DiskMap:
         disk_map.allocate(id_number, amount)
     return disk_map
 
+def parse_run_length_disk_map(file:Path, separator:str|None=None) -> RunLengthDiskMap:
+    '''
+    :separator: If given, the lengths are separated by this string and may be
+    longer than one digit. Otherwise, each character is one length.
+    '''
+    with open(file, "rt") as f:
+        text = f.read().rstrip()
+    disk_map = RunLengthDiskMap()
+    for i, amount in enumerate(text if separator is None else text.split(separator)):
+        id_number = i // 2 if i % 2 == 0 else None
+        disk_map.allocate(id_number, int(amount))
+    return disk_map
+
+def parse_dense_disk_map(file:Path) -> str:
+    with open(file, "rt") as f:
+        return f.read().rstrip()
+
 def main() -> None:
-    disk_map = parse_disk_map(Util.get_input_path(9, "Input"))
+    input_path = Util.get_input_path(9, "Input")
     print("Part 1:")
-    disk_map2 = disk_map.copy() # probably faster to copy than to reparse.
-    disk_map2.move_blocks()
-    print(disk_map2.get_checksum())
+    print(get_compacted_checksum(parse_dense_disk_map(input_path)))
     print("Part 2:")
+    disk_map = parse_run_length_disk_map(input_path)
     disk_map.move_blocks_defragmented()
     print(disk_map.get_checksum())